@@ -4,13 +4,20 @@ Generate goal cards for the Stock Trading Board Game.
 Outputs 32 cards (24 goal + 8 market manipulation) in JSON format.
 """
 
+from __future__ import annotations
+
 import json
 import random
-from typing import List, Dict, Set, Tuple, Optional
-from collections import Counter
+import sys
+from collections import Counter, namedtuple
+from itertools import combinations, permutations
 
 COLORS = ["Blue", "Red", "Yellow", "Black"]
 
+# Each color paired with the next one round the color wheel:
+# Blue/Red, Red/Yellow, Yellow/Black, Black/Blue
+ADJACENT_PAIRS = tuple((color, COLORS[(i + 1) % len(COLORS)]) for i, color in enumerate(COLORS))
+
 # Stock change types
 STOCK_CHANGES = [
     "single_up",      # +1 to one stock
@@ -22,31 +29,107 @@ STOCK_CHANGES = [
     "mixed"           # +1 to one, -1 to another
 ]
 
-# Rewards with estimated dollar values
+# How many goal cards get each stock change type
+# Distribution balanced to net 0:
+# Positive: su(2×+1) + sut(3×+2) + du(6×+2) + mixed(3×+1)
+#         = 2 + 6 + 12 + 3 = 23
+# Negative: sd(2×-1) + sdt(3×-2) + dd(5×-2) + mixed(3×-1)
+#         = 2 + 6 + 10 + 3 = 21... need adjustment
+# Let's balance: su=2,sd=2,sut=3,sdt=3,du=5,dd=5,mixed=4
+# Positive: 2 + 6 + 10 + 4 = 22
+# Negative: 2 + 6 + 10 + 4 = 22 ✓
+STOCK_CHANGE_COUNTS = {
+    "single_up": 2,
+    "single_down": 2,
+    "single_up_twice": 3,
+    "single_down_twice": 3,
+    "double_up": 5,
+    "double_down": 5,
+    "mixed": 4,
+}
+
+# Per-color deltas for each stock change type
+SINGLE_CHANGE_DELTAS = {
+    "single_up": 1,
+    "single_down": -1,
+    "single_up_twice": 2,
+    "single_down_twice": -2,
+}
+PAIR_CHANGE_DELTAS = {
+    "double_up": (1, 1),
+    "double_down": (-1, -1),
+    "mixed": (1, -1),
+}
+
+# Largest rise and fall a single card of each type can give one color
+MAX_COLOR_DELTAS = {
+    **{t: (max(d, 0), min(d, 0)) for t, d in SINGLE_CHANGE_DELTAS.items()},
+    **{t: (max(max(d), 0), min(min(d), 0)) for t, d in PAIR_CHANGE_DELTAS.items()},
+}
+
+# Total rise and fall a single card of each type gives across all colors
+TOTAL_COLOR_DELTAS = {
+    **{t: (max(d, 0), min(d, 0)) for t, d in SINGLE_CHANGE_DELTAS.items()},
+    **{t: (sum(v for v in d if v > 0), sum(v for v in d if v < 0))
+       for t, d in PAIR_CHANGE_DELTAS.items()},
+}
+
+# How many colors a single card of each type touches
+COLORS_TOUCHED = {
+    **{t: 1 for t in SINGLE_CHANGE_DELTAS},
+    **{t: 2 for t in PAIR_CHANGE_DELTAS},
+}
+
+# Rewards with estimated dollar values, and the structured data output
+# under "parsed" for each (parse_reward adds the value)
 # Each reward can be used multiple times (no fixed count requirement)
 REWARDS_WITH_VALUES = [
-    ("Choose investigation increase (0-3) when playing this card", 0.75),
-    ("Draw 2 goal cards", 0.75),
-    ("Extra turn: take another action immediately", 1.00),
-    ("Look at a random goal card from another player", 1.00),
-    ("Gain $1", 1.00),
-    ("Adjust any one stock price by ±1", 1.25),
-    ("Steal $1 from another player", 1.50),
-    ("Your next auction costs $2 less", 2.25),
-    ("Gain $2", 2.00),
-    ("Adjust any one stock price by ±2", 2.50),
-    ("Gain $3", 3.00),
-    ("Swap one of your resource cards with a face-up auction card", 3.00),
-    ("Gain $4", 4.00),
+    ("Choose investigation increase (0-3) when playing this card", 0.75,
+     {"type": "choose_investigation", "requiresTarget": False, "requiresChoice": True}),
+    ("Draw 2 goal cards", 0.75,
+     {"type": "draw_goal_cards", "amount": 2, "requiresTarget": False, "requiresChoice": False}),
+    ("Extra turn: take another action immediately", 1.00,
+     {"type": "extra_turn", "requiresTarget": False, "requiresChoice": False}),
+    ("Look at a random goal card from another player", 1.00,
+     {"type": "look_at_goal_card", "requiresTarget": True, "requiresChoice": False}),
+    ("Gain $1", 1.00,
+     {"type": "gain_cash", "amount": 1, "requiresTarget": False, "requiresChoice": False}),
+    ("Adjust any one stock price by ±1", 1.25,
+     {"type": "adjust_stock", "amount": 1, "requiresTarget": False, "requiresChoice": True}),
+    ("Steal $1 from another player", 1.50,
+     {"type": "steal_cash", "amount": 1, "requiresTarget": True, "requiresChoice": False}),
+    ("Your next auction costs $2 less", 2.25,
+     {"type": "next_auction_discount", "discount": 2, "requiresTarget": False, "requiresChoice": False}),
+    ("Gain $2", 2.00,
+     {"type": "gain_cash", "amount": 2, "requiresTarget": False, "requiresChoice": False}),
+    ("Adjust any one stock price by ±2", 2.50,
+     {"type": "adjust_stock_2", "amount": 2, "requiresTarget": False, "requiresChoice": True}),
+    ("Gain $3", 3.00,
+     {"type": "gain_cash", "amount": 3, "requiresTarget": False, "requiresChoice": False}),
+    ("Swap one of your resource cards with a face-up auction card", 3.00,
+     {"type": "swap_with_face_up", "requiresTarget": False, "requiresChoice": True}),
+    ("Gain $4", 4.00,
+     {"type": "gain_cash", "amount": 4, "requiresTarget": False, "requiresChoice": False}),
 ]
 
 # Derived list for backwards compatibility
 ORDERED_REWARDS = [r[0] for r in REWARDS_WITH_VALUES]
 REWARD_VALUES = {r[0]: r[1] for r in REWARDS_WITH_VALUES}
+REWARD_SPECS = {r[0]: r[2] for r in REWARDS_WITH_VALUES}
+
+# Fallback dollar value for rewards not in REWARD_VALUES
+TIER_VALUES = {"low": 1, "medium": 2, "high": 3}
+
+# Parsed data for reward texts that aren't in REWARDS_WITH_VALUES
+UNKNOWN_REWARD_SPEC = {"type": "unknown", "requiresTarget": False, "requiresChoice": False}
 
 # Target total EV for all cards (matching market manipulation baseline)
 TARGET_EV = 3.0
 
+# Best-case total EV a stock change must allow for (gives reward system room to work)
+MIN_MAX_EV = 2.70
+MAX_REWARD_VALUE = max(r[1] for r in REWARDS_WITH_VALUES)
+
 # Goal completion probabilities (with ~3.5 cards in hand)
 COMPLETION_PROBS = {
     "pair": 0.80,
@@ -69,7 +152,22 @@ CARDS_REQUIRED = {
 
 HAND_SIZE = 4.0
 
-def create_market_manipulation_cards() -> List[Dict]:
+
+def color_vector(color_counts: dict[str, int]) -> tuple[int, int, int, int]:
+    """Convert a color-keyed dict into a 4-int tuple ordered like COLORS."""
+    return tuple(color_counts.get(color, 0) for color in COLORS)
+
+
+def make_stock_change(change_type: str, text: str, changes: dict[str, int]) -> dict:
+    """Build a stock change dict."""
+    return {
+        "type": change_type,
+        "text": text,
+        "changes": changes
+    }
+
+
+def create_market_manipulation_cards() -> list[dict]:
     """Create 8 market manipulation cards with no goal requirements.
 
     These cards are powerful stock manipulation effects:
@@ -82,20 +180,11 @@ def create_market_manipulation_cards() -> List[Dict]:
 
     # +2/+1 cards - each color gets +2 once and +1 once
     # Pattern: Blue+2/Red+1, Red+2/Yellow+1, Yellow+2/Black+1, Black+2/Blue+1
-    plus_patterns = [
-        ("Blue", "Red"),
-        ("Red", "Yellow"),
-        ("Yellow", "Black"),
-        ("Black", "Blue")
-    ]
-
-    for primary, secondary in plus_patterns:
+    for primary, secondary in ADJACENT_PAIRS:
         changes = {primary: 2, secondary: 1}
-        stock_change = {
-            "type": "plus_two_plus_one",
-            "text": f"{primary} +2 / {secondary} +1",
-            "changes": changes
-        }
+        stock_change = make_stock_change(
+            "plus_two_plus_one", f"{primary} +2 / {secondary} +1", changes
+        )
         card = {
             "goal_type": "none",
             "goal_text": "",
@@ -109,11 +198,7 @@ def create_market_manipulation_cards() -> List[Dict]:
     # -3 cards - one per color
     for color in COLORS:
         changes = {color: -3}
-        stock_change = {
-            "type": "single_down_triple",
-            "text": f"{color} -3",
-            "changes": changes
-        }
+        stock_change = make_stock_change("single_down_triple", f"{color} -3", changes)
         card = {
             "goal_type": "none",
             "goal_text": "",
@@ -127,75 +212,47 @@ def create_market_manipulation_cards() -> List[Dict]:
     return cards
 
 
-def create_goal_cards() -> List[Dict]:
-    """Create all 24 base goal cards (without stock changes assigned yet)."""
+def build_goal_cards() -> list[dict]:
+    """Build all 24 base goal cards (without stock changes assigned yet)."""
+    # (goal_type, color combinations, count required of each color in a combination)
+    goal_card_specs = [
+        # Three of a kind - 4 cards (one per color)
+        ("three_of_a_kind", [(color,) for color in COLORS], (3,)),
+        # Pair - 4 cards (one per color)
+        ("pair", [(color,) for color in COLORS], (2,)),
+        # Pair + Specific - 4 cards (2 of one color + 1 of the next)
+        ("pair_plus_specific", ADJACENT_PAIRS, (2, 1)),
+        # Three Different - 4 cards (all combinations of 3 colors)
+        ("three_different", list(combinations(COLORS, 3)), (1, 1, 1)),
+        # Two Pair - 4 cards (adjacent color pairs)
+        ("two_pair", ADJACENT_PAIRS, (2, 2)),
+        # One of Every - 4 cards (all 4 colors)
+        ("one_of_every", [tuple(COLORS)] * 4, (1, 1, 1, 1)),
+    ]
+
     cards = []
+    for goal_type, combos, counts in goal_card_specs:
+        for combo in combos:
+            required_colors = dict(zip(combo, counts))
+            cards.append({
+                "goal_type": goal_type,
+                "goal_text": " + ".join(f"{count} {color}" for color, count in required_colors.items()),
+                "required_colors": required_colors,
+            })
 
-    # Three of a kind - 4 cards (one per color)
-    for color in COLORS:
-        cards.append({
-            "goal_type": "three_of_a_kind",
-            "goal_text": f"3 {color}",
-            "required_colors": {color: 3},
-        })
+    return cards
 
-    # Pair - 4 cards (one per color)
-    for color in COLORS:
-        cards.append({
-            "goal_type": "pair",
-            "goal_text": f"2 {color}",
-            "required_colors": {color: 2},
-        })
-
-    # Pair + Specific - 4 cards (various combinations)
-    pair_specific_combos = [
-        ("Blue", "Red"),
-        ("Red", "Yellow"),
-        ("Yellow", "Black"),
-        ("Black", "Blue")
-    ]
-    for color1, color2 in pair_specific_combos:
-        cards.append({
-            "goal_type": "pair_plus_specific",
-            "goal_text": f"2 {color1} + 1 {color2}",
-            "required_colors": {color1: 2, color2: 1},
-        })
-
-    # Three Different - 4 cards (all combinations of 3 colors)
-    from itertools import combinations
-    for combo in combinations(COLORS, 3):
-        cards.append({
-            "goal_type": "three_different",
-            "goal_text": f"1 {combo[0]} + 1 {combo[1]} + 1 {combo[2]}",
-            "required_colors": {combo[0]: 1, combo[1]: 1, combo[2]: 1},
-        })
-
-    # Two Pair - 4 cards (adjacent color pairs)
-    two_pair_combos = [
-        ("Blue", "Red"),
-        ("Red", "Yellow"),
-        ("Yellow", "Black"),
-        ("Black", "Blue")
-    ]
-    for color1, color2 in two_pair_combos:
-        cards.append({
-            "goal_type": "two_pair",
-            "goal_text": f"2 {color1} + 2 {color2}",
-            "required_colors": {color1: 2, color2: 2},
-        })
-
-    # One of Every - 4 cards (all 4 colors)
-    for _ in range(4):
-        cards.append({
-            "goal_type": "one_of_every",
-            "goal_text": "1 Blue + 1 Red + 1 Yellow + 1 Black",
-            "required_colors": {color: 1 for color in COLORS},
-        })
 
-    return cards
+# The base goal cards only depend on COLORS, so they are built once at import
+BASE_GOAL_CARDS = tuple(build_goal_cards())
 
 
-def calculate_stock_change_ev(card: Dict, stock_change: Dict) -> float:
+def create_goal_cards() -> list[dict]:
+    """Return fresh copies of the 24 base goal cards (without stock changes assigned yet)."""
+    return [{**card, "required_colors": dict(card["required_colors"])} for card in BASE_GOAL_CARDS]
+
+
+def calculate_stock_change_ev(card: dict, stock_change: dict) -> float:
     """Calculate the relative-advantage EV of a stock change.
 
     Uses the principle: value = my wealth change - opponent wealth change.
@@ -265,146 +322,90 @@ def calculate_stock_change_ev(card: Dict, stock_change: Dict) -> float:
     return ev
 
 
-def weighted_choice(colors: List[str], color_frequency: Optional[Counter] = None) -> str:
-    """Choose a color with weighting based on frequency (lower frequency = higher weight)."""
-    if color_frequency is None or not color_frequency:
-        return random.choice(colors)
+def enumerate_stock_changes() -> dict[str, tuple[dict, ...]]:
+    """Enumerate every possible stock change, grouped by change type.
 
-    # Calculate weights: lower frequency = higher weight
-    max_freq = max(color_frequency[c] for c in colors) if colors else 1
-    weights = [(max_freq - color_frequency[c] + 1) for c in colors]
+    With only 4 colors each type has at most 12 distinct outcomes, so the
+    whole space is built once instead of being re-sampled for every card.
+    Candidates also carry their changes as a color vector ("changes_vec"),
+    which only the assignment search reads; build_assigned_cards drops it.
+    """
+    def make_candidate(change_type, text, changes):
+        return {**make_stock_change(change_type, text, changes), "changes_vec": color_vector(changes)}
 
-    # If all weights are 0, use equal weights
-    if sum(weights) == 0:
-        return random.choice(colors)
+    all_changes = {}
 
-    # Use weighted random choice
-    return random.choices(colors, weights=weights, k=1)[0]
+    for change_type, delta in SINGLE_CHANGE_DELTAS.items():
+        all_changes[change_type] = tuple(
+            make_candidate(change_type, f"{color} {delta:+d}", {color: delta})
+            for color in COLORS
+        )
 
+    for change_type, (delta1, delta2) in PAIR_CHANGE_DELTAS.items():
+        # Same-sign pairs are unordered; mixed pairs care which color goes up
+        pairs = combinations(COLORS, 2) if delta1 == delta2 else permutations(COLORS, 2)
+        all_changes[change_type] = tuple(
+            make_candidate(
+                change_type,
+                f"{color1} {delta1:+d} / {color2} {delta2:+d}",
+                {color1: delta1, color2: delta2}
+            )
+            for color1, color2 in pairs
+        )
 
-def weighted_sample(colors: List[str], k: int, color_frequency: Optional[Counter] = None) -> List[str]:
-    """Sample k colors with weighting based on frequency (lower frequency = higher weight)."""
-    if color_frequency is None or not color_frequency or k >= len(colors):
-        return random.sample(colors, k)
+    return all_changes
 
-    # Sort colors by frequency and pick the k least used, with some randomness
-    sorted_colors = sorted(colors, key=lambda c: color_frequency[c])
 
-    # Pick from the k*2 least-used colors (or all if fewer)
-    pool_size = min(len(sorted_colors), max(k * 2, k + 2))
-    pool = sorted_colors[:pool_size]
+ALL_CHANGES = enumerate_stock_changes()
 
-    # Now do weighted selection from this pool
-    selected = []
-    remaining = pool.copy()
 
-    for _ in range(k):
-        if not remaining:
-            break
-        color = weighted_choice(remaining, color_frequency)
-        selected.append(color)
-        remaining.remove(color)
-
-    return selected
+def summarize_stock_changes(cards: list[dict], max_difference: int = 2) -> tuple[dict[str, int], bool, dict[str, int], bool]:
+    """Compute net changes and color frequency, and check both, in a single pass over the cards.
 
+    Returns (net_changes, balanced, color_freq, freq_in_range). net_changes
+    has every color; color_freq only has colors some stock change touches,
+    and freq_in_range checks that their counts are within max_difference.
+    The calculate_* and validate_* helpers below each return one of these.
+    """
+    # Counted from the changes dicts, which are what gets written out
+    net = [0, 0, 0, 0]
+    freq = [0, 0, 0, 0]
+    for card in cards:
+        if "stock_change" not in card:
+            continue
+        for color, change in card["stock_change"]["changes"].items():
+            i = COLORS.index(color)
+            net[i] += change
+            freq[i] += 1
 
-def generate_stock_change(change_type: str, colors: List[str], color_frequency: Optional[Counter] = None) -> Dict:
-    """Generate a stock change specification of the given type, with optional color frequency balancing."""
-    if change_type == "single_up":
-        color = weighted_choice(colors, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{color} +1",
-            "changes": {color: 1}
-        }
-    elif change_type == "single_down":
-        color = weighted_choice(colors, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{color} -1",
-            "changes": {color: -1}
-        }
-    elif change_type == "single_up_twice":
-        color = weighted_choice(colors, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{color} +2",
-            "changes": {color: 2}
-        }
-    elif change_type == "single_down_twice":
-        color = weighted_choice(colors, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{color} -2",
-            "changes": {color: -2}
-        }
-    elif change_type == "double_up":
-        colors_chosen = weighted_sample(colors, 2, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{colors_chosen[0]} +1 / {colors_chosen[1]} +1",
-            "changes": {colors_chosen[0]: 1, colors_chosen[1]: 1}
-        }
-    elif change_type == "double_down":
-        colors_chosen = weighted_sample(colors, 2, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{colors_chosen[0]} -1 / {colors_chosen[1]} -1",
-            "changes": {colors_chosen[0]: -1, colors_chosen[1]: -1}
-        }
-    elif change_type == "mixed":
-        colors_chosen = weighted_sample(colors, 2, color_frequency)
-        return {
-            "type": change_type,
-            "text": f"{colors_chosen[0]} +1 / {colors_chosen[1]} -1",
-            "changes": {colors_chosen[0]: 1, colors_chosen[1]: -1}
-        }
+    net_changes = dict(zip(COLORS, net))
+    color_freq = {color: f for color, f in zip(COLORS, freq) if f}
+    used_freq = list(color_freq.values()) or [0]
+    freq_in_range = max(used_freq) - min(used_freq) <= max_difference
+    return net_changes, all(n == 0 for n in net), color_freq, freq_in_range
 
 
-def calculate_net_changes(cards: List[Dict]) -> Dict[str, int]:
+def calculate_net_changes(cards: list[dict]) -> dict[str, int]:
     """Calculate the net change for each color across all cards."""
-    net_changes = {color: 0 for color in COLORS}
-
-    for card in cards:
-        if "stock_change" in card:
-            changes = card["stock_change"]["changes"]
-            for color, change in changes.items():
-                net_changes[color] += change
-
-    return net_changes
+    return summarize_stock_changes(cards)[0]
 
 
-def validate_balance(cards: List[Dict]) -> bool:
+def validate_balance(cards: list[dict]) -> bool:
     """Validate that all colors have net zero change."""
-    net_changes = calculate_net_changes(cards)
-    return all(change == 0 for change in net_changes.values())
+    return summarize_stock_changes(cards)[1]
 
 
-def calculate_color_frequency(cards: List[Dict]) -> Dict[str, int]:
+def calculate_color_frequency(cards: list[dict]) -> dict[str, int]:
     """Calculate how many times each color appears in stock changes."""
-    from collections import Counter
-    color_freq = Counter()
-    for card in cards:
-        if "stock_change" in card:
-            for color in COLORS:
-                if color in card["stock_change"]["text"]:
-                    color_freq[color] += 1
-    return dict(color_freq)
+    return summarize_stock_changes(cards)[2]
 
 
-def validate_color_frequency_balance(cards: List[Dict], max_difference: int = 2) -> bool:
+def validate_color_frequency_balance(cards: list[dict], max_difference: int = 2) -> bool:
     """Validate that color frequencies are within acceptable range."""
-    color_freq = calculate_color_frequency(cards)
-
-    if not color_freq:
-        return True
+    return summarize_stock_changes(cards, max_difference)[3]
 
-    max_freq = max(color_freq.values())
-    min_freq = min(color_freq.values())
-    return (max_freq - min_freq) <= max_difference
 
-
-def validate_plus_minus_two_balance(cards: List[Dict]) -> bool:
+def validate_plus_minus_two_balance(cards: list[dict]) -> bool:
     """Validate that each color has at least one +2 and one -2."""
     plus2_colors = set()
     minus2_colors = set()
@@ -425,7 +426,7 @@ def validate_plus_minus_two_balance(cards: List[Dict]) -> bool:
     return plus2_colors == all_colors and minus2_colors == all_colors
 
 
-def is_valid_combination(card: Dict, stock_change: Dict) -> bool:
+def is_valid_combination(card: dict, stock_change: dict) -> bool:
     """Check if a stock change is valid for a goal card (anti-synergy rules).
 
     Rules:
@@ -436,251 +437,423 @@ def is_valid_combination(card: Dict, stock_change: Dict) -> bool:
     - General: Don't allow 3+ synergy matches of same sign
     - One of Every: Only positive changes allowed (handled by type restriction)
     """
-    required_colors_dict = card.get("required_colors", {})
-    required_colors = set(required_colors_dict.keys())
-    changes = stock_change["changes"]
-    goal_type = card.get("goal_type", "")
+    required_vec = color_vector(card.get("required_colors", {}))
+    changes_vec = color_vector(stock_change["changes"])
 
-    # 2+ of a color rule: If collecting 2+ of any color, that color cannot
-    # appear in stock changes at all (no positive or negative).
-    # Applies to: pair, pair_plus_specific (the pair color), three_of_a_kind, two_pair
-    for color, count in required_colors_dict.items():
-        if count >= 2 and color in changes:
-            return False
+    positive_synergy_count = 0
+    negative_synergy_count = 0
+    for i in range(4):
+        count = required_vec[i]
+        change = changes_vec[i]
+        if not count or not change:
+            continue
 
-    # General: Don't strongly penalize (-2) what you're collecting (even singles)
-    for color in required_colors:
-        if color in changes and changes[color] <= -2:
+        # 2+ of a color rule: If collecting 2+ of any color, that color cannot
+        # appear in stock changes at all (no positive or negative).
+        # Applies to: pair, pair_plus_specific (the pair color), three_of_a_kind, two_pair
+        if count >= 2:
             return False
 
-    # General: Don't strongly boost (+2) what you're collecting (even singles)
-    for color in required_colors:
-        if color in changes and changes[color] == 2:
+        # General: Don't strongly penalize (-2) or boost (+2) what you're
+        # collecting (even singles)
+        if change <= -2 or change == 2:
             return False
 
-    # Don't allow 3+ synergy matches of same sign
-    positive_synergy_count = 0
-    negative_synergy_count = 0
-    for color, count in required_colors_dict.items():
-        if color in changes:
-            if changes[color] == 1:
-                positive_synergy_count += count
-            elif changes[color] == -1:
-                negative_synergy_count += count
+        if change == 1:
+            positive_synergy_count += count
+        elif change == -1:
+            negative_synergy_count += count
 
+    # Don't allow 3+ synergy matches of same sign
     if positive_synergy_count >= 3 or negative_synergy_count >= 3:
         return False
 
     return True
 
 
-def assign_stock_changes(cards: List[Dict], seed: int = None) -> List[Dict]:
-    """Assign stock changes to cards following all rules and distribution requirements."""
-    if seed is not None:
-        random.seed(seed)
+# Valid stock changes per required-color vector, filled lazily by
+# get_valid_stock_changes
+_VALID_CHANGES_CACHE: dict[tuple, dict[str, tuple[dict, ...]]] = {}
 
-    max_attempts = 20000
-    for attempt in range(max_attempts):
-        # Distribution balanced to net 0:
-        # Positive: su(2×+1) + sut(3×+2) + du(6×+2) + mixed(3×+1)
-        #         = 2 + 6 + 12 + 3 = 23
-        # Negative: sd(2×-1) + sdt(3×-2) + dd(5×-2) + mixed(3×-1)
-        #         = 2 + 6 + 10 + 3 = 21... need adjustment
-        # Let's balance: su=2,sd=2,sut=3,sdt=3,du=5,dd=5,mixed=4
-        # Positive: 2 + 6 + 10 + 4 = 22
-        # Negative: 2 + 6 + 10 + 4 = 22 ✓
-        stock_change_counts = {
-            "single_up": 2,
-            "single_down": 2,
-            "single_up_twice": 3,
-            "single_down_twice": 3,
-            "double_up": 5,
-            "double_down": 5,
-            "mixed": 4,
+
+def get_valid_stock_changes(card: dict) -> dict[str, tuple[dict, ...]]:
+    """Return the stock changes that pass is_valid_combination for a card, by type.
+
+    Validity only depends on the required colors, so the filter runs once
+    per distinct requirement no matter how many assignment attempts are made.
+    """
+    key = color_vector(card.get("required_colors", {}))
+    valid = _VALID_CHANGES_CACHE.get(key)
+    if valid is None:
+        valid = {
+            change_type: tuple(sc for sc in candidates if is_valid_combination(card, sc))
+            for change_type, candidates in ALL_CHANGES.items()
         }
+        _VALID_CHANGES_CACHE[key] = valid
+    return valid
 
-        # Separate cards by type
-        # one_of_every cards can only use single_up or double_up
-        # All other cards (including pair) use general assignment
-        one_of_every_cards = [c for c in cards if c.get("goal_type") == "one_of_every"]
-        other_cards = [c for c in cards if c.get("goal_type") != "one_of_every"]
-        random.shuffle(other_cards)
-
-        # Track how many of each type we've used
-        used_counts = {change: 0 for change in STOCK_CHANGES}
-
-        # Track current net changes
-        current_net = {color: 0 for color in COLORS}
-
-        # Track color frequency (how many times each color appears)
-        color_frequency = Counter({color: 0 for color in COLORS})
-
-        # Assign stock changes
-        assigned_cards = []
-
-        # Helper function for scoring balance
-        def combined_score(stock_change):
-            # Net balance score (lower is better)
-            net_score = 0
-            for color, change in stock_change["changes"].items():
-                new_value = current_net[color] + change
-                net_score += abs(new_value)
-
-            # Frequency balance score (lower is better)
-            simulated_freq = color_frequency.copy()
-            for color in COLORS:
-                if color in stock_change["text"]:
-                    simulated_freq[color] += 1
-
-            if simulated_freq:
-                max_freq = max(simulated_freq.values())
-                min_freq = min(simulated_freq.values())
-                freq_score = (max_freq - min_freq) * 10
-            else:
-                freq_score = 0
-
-            return net_score + freq_score
-
-        # 1. Assign one_of_every cards FIRST (only positive changes allowed)
-        for card in one_of_every_cards:
-            valid_attempts = []
-            for change_type in ["single_up", "double_up"]:
-                if used_counts[change_type] >= stock_change_counts[change_type]:
-                    continue
-
-                for _ in range(50):
-                    stock_change = generate_stock_change(change_type, COLORS, color_frequency)
-                    if is_valid_combination(card, stock_change):
-                        valid_attempts.append((change_type, stock_change))
-
-            if valid_attempts:
-                valid_attempts.sort(key=lambda x: combined_score(x[1]))
-                top_choices = max(1, len(valid_attempts) // 3)
-                change_type, stock_change = random.choice(valid_attempts[:top_choices])
-
-                used_counts[change_type] += 1
-                for color, change in stock_change["changes"].items():
-                    current_net[color] += change
-
-                for color in COLORS:
-                    if color in stock_change["text"]:
-                        color_frequency[color] += 1
-
-                complete_card = card.copy()
-                complete_card["stock_change"] = stock_change
-                complete_card["stock_ev"] = calculate_stock_change_ev(complete_card, stock_change)
-                assigned_cards.append(complete_card)
-
-        # Track which stock change types have been used per goal type (for diversity)
-        goal_type_sc_types = {}  # goal_type -> set of stock change types used
-
-        # 2. Assign all other cards (use regular stock change types)
-        for card in other_cards:
-            goal_type = card.get("goal_type", "unknown")
-            used_sc_types = goal_type_sc_types.get(goal_type, set())
-
-            # Find valid stock change types for this card
-            prob = COMPLETION_PROBS.get(goal_type, 0.5)
-            max_reward = max(rv for _, rv in REWARDS_WITH_VALUES)
-            valid_attempts = []
-
-            # Try each stock change type that still has quota
+
+def net_is_reachable(current_net: list[int], used_counts: dict[str, int]) -> bool:
+    """Check whether the remaining quota could still bring every color back to net zero.
+
+    Two necessary conditions: each color's net must be within what the
+    remaining cards could move that one color, and the total rise (and fall)
+    still needed across all colors must fit within what the remaining cards
+    add up to. A False result means the attempt can never balance and can
+    be abandoned early.
+    """
+    remaining_up = 0
+    remaining_down = 0
+    total_up = 0
+    total_down = 0
+    for change_type, quota in STOCK_CHANGE_COUNTS.items():
+        remaining = quota - used_counts[change_type]
+        if not remaining:
+            continue
+        max_up, max_down = MAX_COLOR_DELTAS[change_type]
+        remaining_up += remaining * max_up
+        remaining_down -= remaining * max_down
+        sum_up, sum_down = TOTAL_COLOR_DELTAS[change_type]
+        total_up += remaining * sum_up
+        total_down -= remaining * sum_down
+
+    needed_up = 0
+    needed_down = 0
+    for net in current_net:
+        if net > remaining_down or -net > remaining_up:
+            return False
+        if net > 0:
+            needed_down += net
+        else:
+            needed_up -= net
+    return needed_up <= total_up and needed_down <= total_down
+
+
+def frequency_is_reachable(color_frequency: list[int], used_counts: dict[str, int],
+                           max_difference: int = 2) -> bool:
+    """Check whether the remaining quota could still even out color frequencies.
+
+    Frequencies only grow, so every color must end within max_difference of
+    the current maximum. Each remaining card can lift a color by at most one,
+    and all remaining cards together touch a fixed number of colors, so a
+    shortfall beyond either means the attempt can be abandoned early.
+    """
+    remaining_cards = 0
+    remaining_touches = 0
+    for change_type, quota in STOCK_CHANGE_COUNTS.items():
+        remaining = quota - used_counts[change_type]
+        remaining_cards += remaining
+        remaining_touches += remaining * COLORS_TOUCHED[change_type]
+
+    floor = max(color_frequency) - max_difference
+    shortfall = 0
+    for freq in color_frequency:
+        if freq < floor:
+            if floor - freq > remaining_cards:
+                return False
+            shortfall += floor - freq
+    return shortfall <= remaining_touches
+
+
+def balance_score(stock_change: dict, current_net: list[int], color_frequency: list[int],
+                  freq_max: int, freq_min: int) -> int:
+    """Score how far a stock change would push the running totals off balance.
+
+    stock_change is one of the ALL_CHANGES candidates, since the search
+    works on their color vectors. current_net and color_frequency are
+    indexed like COLORS, and freq_max / freq_min are the current max and min
+    of color_frequency (the same for every candidate on a card, so callers
+    work them out once). Combines the net change on the touched colors with
+    the spread of color frequencies after the change. Lower is better.
+    """
+    # Net balance score, updating the frequency bounds for the touched colors
+    net_score = 0
+    new_max = freq_max
+    touches_min = False
+    changes_vec = stock_change["changes_vec"]
+    for i in range(4):
+        if changes_vec[i]:
+            net_score += abs(current_net[i] + changes_vec[i])
+            freq = color_frequency[i]
+            if freq + 1 > new_max:
+                new_max = freq + 1
+            if freq == freq_min:
+                touches_min = True
+
+    # Raising a least-used color may lift the minimum, so only then rescan
+    new_min = freq_min
+    if touches_min:
+        new_min = min(freq + (1 if changes_vec[i] else 0) for i, freq in enumerate(color_frequency))
+
+    # Frequency balance score
+    freq_score = (new_max - new_min) * 10
+
+    return net_score + freq_score
+
+
+def reaches_ev_floor(card: dict, stock_change: dict) -> bool:
+    """Check that the best reward could still lift a card's total EV to MIN_MAX_EV."""
+    prob = COMPLETION_PROBS.get(card.get("goal_type", "unknown"), 0.5)
+    sev = calculate_stock_change_ev(card.copy(), stock_change)
+    mev = sum(abs(v) for v in stock_change["changes"].values())
+    max_ev = sev + prob * MAX_REWARD_VALUE + (1 - prob) * mev
+    return max_ev >= MIN_MAX_EV
+
+
+# One card's pick within an assignment attempt; only expanded into a full
+# card dict by build_assigned_cards once an attempt is complete
+Assignment = namedtuple("Assignment", "card_idx stock_change")
+
+
+def build_assigned_cards(cards: list[dict], assignments: list[Assignment]) -> list[dict]:
+    """Expand assignment records into card dicts with their stock change and EV.
+
+    Only called once per run, after the search, so each card is copied
+    exactly once. Candidates are shared with ALL_CHANGES, so every card also
+    gets its own stock change dict, without the search-only color vector.
+    """
+    assigned_cards = [None] * len(assignments)
+    for slot, (card_idx, candidate) in enumerate(assignments):
+        stock_change = make_stock_change(candidate["type"], candidate["text"], dict(candidate["changes"]))
+        complete_card = {**cards[card_idx], "stock_change": stock_change}
+        complete_card["stock_ev"] = calculate_stock_change_ev(complete_card, stock_change)
+        assigned_cards[slot] = complete_card
+    return assigned_cards
+
+
+def try_assign_stock_changes(cards: list[dict], valid_changes_by_card: list[dict],
+                             ev_changes_by_card: list[dict],
+                             one_of_every_order: list[int],
+                             other_order: list[int],
+                             rng: random.Random,
+                             max_steps: int = 2000) -> tuple[list[Assignment], bool]:
+    """Backtracking search for a balanced stock change assignment.
+
+    valid_changes_by_card holds get_valid_stock_changes() for each card, in
+    the same order as cards, and ev_changes_by_card the subset of those that
+    pass reaches_ev_floor(). The two order lists are indices into cards.
+
+    one_of_every cards are placed first, then the other cards, always taking
+    the card with the fewest candidates left (ties broken by a fresh shuffle
+    of other_order). Each card tries its best-scoring third of candidates in
+    random order before the rest, so repeated searches still give varied
+    decks. Every placement is forward-checked with net_is_reachable, and a
+    full assignment is only accepted when all colors net to zero and color
+    frequencies are balanced.
+
+    Returns (assignments, balanced). If no balanced assignment is found
+    within max_steps placements, balanced is False and assignments is the
+    deepest one the search reached, so assign_stock_changes can restart with
+    a new shuffle and still report on its best attempt.
+    """
+    # Bound once; called for every card the search visits
+    shuffle = rng.shuffle
+
+    # Shuffled in place, so min() over it breaks candidate-count ties randomly
+    shuffle(other_order)
+
+    # Track how many of each type we've used
+    used_counts = dict.fromkeys(STOCK_CHANGES, 0)
+
+    # Track current net changes
+    current_net = [0, 0, 0, 0]
+
+    # Track color frequency (how many times each color appears), indexed like COLORS
+    color_frequency = [0, 0, 0, 0]
+
+    # Track which stock change types have been used per goal type (for diversity)
+    goal_type_sc_counts = {}  # goal_type -> Counter of stock change types used
+
+    # Stock changes placed so far, in placement order, and which cards have one
+    assignments = []
+    placed = [False] * len(cards)
+
+    # Deepest assignment reached so far, kept in case no balanced one is found
+    best_assignments = []
+    steps = 0
+
+    def has_quota(change_type):
+        return used_counts[change_type] < STOCK_CHANGE_COUNTS[change_type]
+
+    def ranked(valid_attempts, score):
+        # Best third in random order (for variety), then the rest best-first
+        ranked_attempts = sorted(valid_attempts, key=score)
+        top_choices = max(1, len(ranked_attempts) // 3)
+        best_attempts = ranked_attempts[:top_choices]
+        shuffle(best_attempts)
+        return best_attempts + ranked_attempts[top_choices:]
+
+    def one_of_every_attempts(card_idx):
+        # only positive changes allowed
+        valid_changes = valid_changes_by_card[card_idx]
+        valid_attempts = [
+            (change_type, stock_change)
+            for change_type in ["single_up", "double_up"]
+            if has_quota(change_type)
+            for stock_change in valid_changes[change_type]
+        ]
+        freq_max, freq_min = max(color_frequency), min(color_frequency)
+        return ranked(
+            valid_attempts,
+            lambda x: balance_score(x[1], current_net, color_frequency, freq_max, freq_min)
+        )
+
+    def other_attempts(card_idx):
+        valid_changes = valid_changes_by_card[card_idx]
+        ev_changes = ev_changes_by_card[card_idx]
+        goal_type = cards[card_idx].get("goal_type", "unknown")
+        used_sc_types = goal_type_sc_counts.get(goal_type, Counter())
+
+        # Try each stock change type that still has quota; every candidate
+        # here already passes the anti-synergy rules and the EV floor
+        valid_attempts = [
+            (change_type, stock_change)
+            for change_type in STOCK_CHANGES
+            if has_quota(change_type)
+            for stock_change in ev_changes[change_type]
+        ]
+
+        if not valid_attempts:
+            # Fallback: drop the EV floor and use the first remaining type
+            # that has any valid candidate
             for change_type in STOCK_CHANGES:
-                if used_counts[change_type] >= stock_change_counts[change_type]:
-                    continue
-
-                # Try to generate a valid stock change of this type multiple times
-                max_color_attempts = 50
-                for _ in range(max_color_attempts):
-                    stock_change = generate_stock_change(change_type, COLORS, color_frequency)
-                    # Check anti-synergy rules
-                    if not is_valid_combination(card, stock_change):
-                        continue
-                    # Check that max possible EV can reach $2.70
-                    # (gives reward system room to work)
-                    temp_card = card.copy()
-                    sev = calculate_stock_change_ev(temp_card, stock_change)
-                    mev = sum(abs(v) for v in stock_change["changes"].values())
-                    max_ev = sev + prob * max_reward + (1 - prob) * mev
-                    if max_ev < 2.70:
-                        continue
-                    valid_attempts.append((change_type, stock_change))
+                if has_quota(change_type) and valid_changes[change_type]:
+                    valid_attempts = [(change_type, sc) for sc in valid_changes[change_type]]
+                    break
+
+        # Score each attempt: balance + diversity within goal type
+        freq_max, freq_min = max(color_frequency), min(color_frequency)
+
+        def diversity_score(attempt):
+            change_type, sc = attempt
+            base = balance_score(sc, current_net, color_frequency, freq_max, freq_min)
+            # Penalize reusing the same stock change type within a goal type
+            if used_sc_types[change_type]:
+                base += 5
+            # Penalize same net direction (all positive or all negative)
+            net = sum(sc["changes_vec"])
+            same_sign_cards = [a for a in assignments
+                              if cards[a.card_idx].get("goal_type") == goal_type
+                              and sum(a.stock_change["changes_vec"]) * net > 0]
+            if same_sign_cards:
+                base += 3
+            return base
+
+        return ranked(valid_attempts, diversity_score)
+
+    def remaining_candidates(card_idx):
+        # Domain size used to pick the most constrained card next
+        ev_changes = ev_changes_by_card[card_idx]
+        count = sum(len(ev_changes[t]) for t in STOCK_CHANGES if has_quota(t))
+        if count == 0:
+            valid_changes = valid_changes_by_card[card_idx]
+            count = sum(len(valid_changes[t]) for t in STOCK_CHANGES if has_quota(t))
+        return count
+
+    def place(card_idx, change_type, stock_change, step):
+        goal_type = cards[card_idx].get("goal_type", "unknown")
+        used_counts[change_type] += step
+        goal_type_sc_counts.setdefault(goal_type, Counter())[change_type] += step
+        changes_vec = stock_change["changes_vec"]
+        for i in range(4):
+            if changes_vec[i]:
+                current_net[i] += changes_vec[i] * step
+                color_frequency[i] += step
+        placed[card_idx] = step > 0
+        if step > 0:
+            assignments.append(Assignment(card_idx, stock_change))
+        else:
+            assignments.pop()
+
+    def search():
+        nonlocal steps
+        depth = len(assignments)
+        if depth == total_cards:
+            # Check if balanced (net balance and color frequency)
+            return (all(net == 0 for net in current_net) and
+                    max(color_frequency) - min(color_frequency) <= 2)
+
+        # 1. Assign one_of_every cards FIRST
+        if depth < len(one_of_every_order):
+            card_idx = one_of_every_order[depth]
+            valid_attempts = one_of_every_attempts(card_idx)
+        # 2. Then all other cards, most constrained first
+        else:
+            card_idx = min((i for i in other_order if not placed[i]), key=remaining_candidates)
+            valid_attempts = other_attempts(card_idx)
+
+        for change_type, stock_change in valid_attempts:
+            steps += 1
+            if steps > max_steps:
+                return False
+            place(card_idx, change_type, stock_change, 1)
+            if len(assignments) > len(best_assignments):
+                best_assignments[:] = assignments
+            # Forward check: only go deeper while every net can still reach
+            # zero and color frequencies can still even out
+            if (net_is_reachable(current_net, used_counts) and
+                    frequency_is_reachable(color_frequency, used_counts) and
+                    search()):
+                return True
+            place(card_idx, change_type, stock_change, -1)
+        return False
+
+    total_cards = len(one_of_every_order) + len(other_order)
+    if search():
+        return assignments, True
+    return best_assignments, False
 
-            if not valid_attempts:
-                # Fallback: try any remaining type
-                for change_type in STOCK_CHANGES:
-                    if used_counts[change_type] >= stock_change_counts[change_type]:
-                        continue
-                    for _ in range(20):
-                        stock_change = generate_stock_change(change_type, COLORS, color_frequency)
-                        if is_valid_combination(card, stock_change):
-                            valid_attempts.append((change_type, stock_change))
-                            break
-                    if valid_attempts:
-                        break
-
-            if valid_attempts:
-                # Score each attempt: balance + diversity within goal type
-                def diversity_score(attempt):
-                    change_type, sc = attempt
-                    base = combined_score(sc)
-                    # Penalize reusing the same stock change type within a goal type
-                    if change_type in used_sc_types:
-                        base += 5
-                    # Penalize same net direction (all positive or all negative)
-                    net = sum(sc["changes"].values())
-                    same_sign_cards = [c for c in assigned_cards
-                                      if c.get("goal_type") == goal_type
-                                      and sum(c["stock_change"]["changes"].values()) * net > 0]
-                    if same_sign_cards:
-                        base += 3
-                    return base
-
-                valid_attempts.sort(key=diversity_score)
-                # Pick from top 30% to maintain some randomness
-                top_choices = max(1, len(valid_attempts) // 3)
-                change_type, stock_change = random.choice(valid_attempts[:top_choices])
-
-                used_counts[change_type] += 1
-
-                # Track stock change type per goal type for diversity
-                if goal_type not in goal_type_sc_types:
-                    goal_type_sc_types[goal_type] = set()
-                goal_type_sc_types[goal_type].add(change_type)
-
-                # Update current net
-                for color, change in stock_change["changes"].items():
-                    current_net[color] += change
-
-                # Update color frequency
-                for color in COLORS:
-                    if color in stock_change["text"]:
-                        color_frequency[color] += 1
-
-                # Create the complete card
-                complete_card = card.copy()
-                complete_card["stock_change"] = stock_change
-                complete_card["stock_ev"] = calculate_stock_change_ev(complete_card, stock_change)
-                assigned_cards.append(complete_card)
-
-        # Check if balanced (net balance and color frequency)
-        if (validate_balance(assigned_cards) and
-            validate_color_frequency_balance(assigned_cards)):
-            return assigned_cards
+
+def assign_stock_changes(cards: list[dict], seed: int | None = None) -> list[dict]:
+    """Assign stock changes to cards following all rules and distribution requirements."""
+    # Dedicated generator so seeding doesn't touch the global random state
+    rng = random.Random(seed)
+
+    # Candidate validity never changes between attempts, so resolve it once
+    valid_changes_by_card = [get_valid_stock_changes(card) for card in cards]
+    ev_changes_by_card = [
+        {
+            change_type: tuple(sc for sc in candidates if reaches_ev_floor(card, sc))
+            for change_type, candidates in valid_changes.items()
+        }
+        for card, valid_changes in zip(cards, valid_changes_by_card)
+    ]
+
+    # Separate cards by type, as indices so attempts only shuffle ints
+    # one_of_every cards can only use single_up or double_up
+    # All other cards (including pair) use general assignment
+    one_of_every_order = [i for i, c in enumerate(cards) if c.get("goal_type") == "one_of_every"]
+    other_order = [i for i, c in enumerate(cards) if c.get("goal_type") != "one_of_every"]
+
+    best_assignments = []
+    max_attempts = 500
+    for attempt in range(max_attempts):
+        assignments, balanced = try_assign_stock_changes(
+            cards, valid_changes_by_card, ev_changes_by_card, one_of_every_order, other_order, rng
+        )
+        # The search only accepts an assignment once its running net and
+        # color frequency totals are balanced, so no recount is needed here
+        if balanced:
+            return build_assigned_cards(cards, assignments)
+        # Otherwise the search budget ran out: keep the deepest attempt and
+        # restart with a new shuffle
+        if len(assignments) > len(best_assignments):
+            best_assignments = assignments
 
     # If we couldn't achieve balance, return the best attempt
-    print(f"Warning: Could not achieve perfect balance after {max_attempts} attempts", file=__import__('sys').stderr)
-    print(f"Final net changes: {calculate_net_changes(assigned_cards)}", file=__import__('sys').stderr)
-    color_freq = calculate_color_frequency(assigned_cards)
-    print(f"Final color frequency: {color_freq}", file=__import__('sys').stderr)
-    if color_freq:
-        freq_range = max(color_freq.values()) - min(color_freq.values())
-        print(f"Color frequency range: {freq_range}", file=__import__('sys').stderr)
-    print(f"±2 balance: {validate_plus_minus_two_balance(assigned_cards)}", file=__import__('sys').stderr)
+    assigned_cards = build_assigned_cards(cards, best_assignments)
+    print(f"Warning: Could not achieve perfect balance after {max_attempts} attempts", file=sys.stderr)
+    print(f"Cards with stock changes: {len(assigned_cards)} of {len(cards)}", file=sys.stderr)
+    net_changes, balanced, color_freq, freq_in_range = summarize_stock_changes(assigned_cards)
+    print(f"Final net changes: {net_changes}", file=sys.stderr)
+    print(f"Balanced (all colors net to 0): {balanced}", file=sys.stderr)
+    print(f"Final color frequency: {color_freq}", file=sys.stderr)
+    print(f"Frequency balanced: {freq_in_range}", file=sys.stderr)
+    print(f"±2 balance: {validate_plus_minus_two_balance(assigned_cards)}", file=sys.stderr)
     return assigned_cards
 
 
-def calculate_scores_and_assign_rewards(cards: List[Dict]) -> List[Dict]:
+def calculate_scores_and_assign_rewards(cards: list[dict]) -> list[dict]:
     """Assign rewards to hit TARGET_EV (~$3.00) for each card.
 
     For each card, calculates the ideal reward value:
@@ -725,7 +898,7 @@ def calculate_scores_and_assign_rewards(cards: List[Dict]) -> List[Dict]:
             if reward_usage[reward_idx] >= MAX_REWARD_USES:
                 continue
 
-            reward_text, reward_value = REWARDS_WITH_VALUES[reward_idx]
+            reward_text, reward_value, _ = REWARDS_WITH_VALUES[reward_idx]
 
             # Primary score: distance from needed reward value
             distance = abs(reward_value - needed)
@@ -741,7 +914,7 @@ def calculate_scores_and_assign_rewards(cards: List[Dict]) -> List[Dict]:
                 best_idx = reward_idx
 
         if best_idx is not None:
-            reward_text, reward_value = REWARDS_WITH_VALUES[best_idx]
+            reward_text, reward_value, _ = REWARDS_WITH_VALUES[best_idx]
             card["reward"] = reward_text
             card["reward_value"] = reward_value
             reward_usage[best_idx] += 1
@@ -799,166 +972,59 @@ def calculate_scores_and_assign_rewards(cards: List[Dict]) -> List[Dict]:
     return cards
 
 
-def parse_reward(reward_text: str, reward_tier: str) -> Dict:
-    """Parse reward text to determine type and requirements."""
-    reward_lower = reward_text.lower()
-
+def parse_reward(reward_text: str, reward_tier: str) -> dict:
+    """Look up the structured data for a reward text (see REWARD_SPECS)."""
     # Use fixed dollar value from REWARD_VALUES, fall back to tier
-    value = REWARD_VALUES.get(reward_text, {"low": 1, "medium": 2, "high": 3}.get(reward_tier, 1))
-
-    # Choose investigation
-    if "choose investigation" in reward_lower:
-        return {
-            "type": "choose_investigation",
-            "requiresTarget": False,
-            "requiresChoice": True,
-            "value": value
-        }
-
-    # Look at random goal card
-    if "look at" in reward_lower and "goal card" in reward_lower:
-        return {
-            "type": "look_at_goal_card",
-            "requiresTarget": True,
-            "requiresChoice": False,
-            "value": value
-        }
-
-    # Cash rewards
-    if "gain $" in reward_lower:
-        amount = int(reward_text.split("$")[1].split()[0])
-        return {
-            "type": "gain_cash",
-            "amount": amount,
-            "requiresTarget": False,
-            "requiresChoice": False,
-            "value": value
-        }
-
-    # Steal cash
-    if "steal" in reward_lower and "$" in reward_text:
-        amount = int(reward_text.split("$")[1].split()[0])
-        return {
-            "type": "steal_cash",
-            "amount": amount,
-            "requiresTarget": True,
-            "requiresChoice": False,
-            "value": value
-        }
-
-    # Draw 2 goal cards
-    if "draw 2 goal" in reward_lower:
-        return {
-            "type": "draw_goal_cards",
-            "amount": 2,
-            "requiresTarget": False,
-            "requiresChoice": False,
-            "value": value
-        }
-
-    # Next auction discount
-    if "next auction" in reward_lower and "$2 less" in reward_lower:
-        return {
-            "type": "next_auction_discount",
-            "discount": 2,
-            "requiresTarget": False,
-            "requiresChoice": False,
-            "value": value
-        }
-
-    # Extra turn
-    if "extra turn" in reward_lower:
-        return {
-            "type": "extra_turn",
-            "requiresTarget": False,
-            "requiresChoice": False,
-            "value": value
-        }
+    value = REWARD_VALUES.get(reward_text, TIER_VALUES.get(reward_tier, 1))
+    return {**REWARD_SPECS.get(reward_text, UNKNOWN_REWARD_SPEC), "value": value}
 
-    # Adjust stock ±2 (check before ±1 since both contain "adjust")
-    if "adjust" in reward_lower and "±2" in reward_text:
-        return {
-            "type": "adjust_stock_2",
-            "amount": 2,
-            "requiresTarget": False,
-            "requiresChoice": True,
-            "value": value
-        }
-
-    # Adjust stock ±1
-    if "adjust" in reward_lower and "±1" in reward_text:
-        return {
-            "type": "adjust_stock",
-            "amount": 1,
-            "requiresTarget": False,
-            "requiresChoice": True,
-            "value": value
-        }
 
-    # Swap with face-up card
-    if "swap" in reward_lower and "face-up" in reward_lower:
-        return {
-            "type": "swap_with_face_up",
-            "requiresTarget": False,
-            "requiresChoice": True,
-            "value": value
-        }
-
-    # Default unknown
-    return {
-        "type": "unknown",
-        "requiresTarget": False,
-        "requiresChoice": False,
-        "value": value
-    }
-
-
-def create_final_card_format(card: Dict) -> Dict:
+def create_final_card_format(card: dict) -> dict:
     """Format card for final JSON output with pre-parsed data."""
-    is_market_manipulation = card.get("is_market_manipulation", False)
+    sc = card["stock_change"]
+    stock_change = {
+        "text": sc["text"],
+        "parsed": sc["changes"],
+        "type": sc["type"]
+    }
+    stock_ev = card.get("stock_ev", 0.0)
 
-    if is_market_manipulation:
+    if card.get("is_market_manipulation", False):
         return {
-            "stockChange": {
-                "text": card["stock_change"]["text"],
-                "parsed": card["stock_change"]["changes"],
-                "type": card["stock_change"]["type"]
-            },
+            "stockChange": stock_change,
             "goal": None,
             "reward": None,
             "metadata": {
                 "goalType": "none",
                 "rewardTier": None,
-                "stockEV": card.get("stock_ev", 0.0),
-                "totalEV": card.get("stock_ev", 0.0),
+                "stockEV": stock_ev,
+                "totalEV": stock_ev,
                 "isMarketManipulation": True
             }
         }
 
-    goal_parsed = {
-        "type": card["goal_type"],
-        "requirements": card.get("required_colors", {})
-    }
+    goal_type = card["goal_type"]
+    reward = card["reward"]
+    reward_tier = card["reward_tier"]
 
     return {
-        "stockChange": {
-            "text": card["stock_change"]["text"],
-            "parsed": card["stock_change"]["changes"],
-            "type": card["stock_change"]["type"]
-        },
+        "stockChange": stock_change,
         "goal": {
             "text": card["goal_text"],
-            "parsed": goal_parsed
+            "parsed": {
+                "type": goal_type,
+                "requirements": card.get("required_colors", {})
+            }
         },
         "reward": {
-            "text": card["reward"],
-            "parsed": parse_reward(card["reward"], card["reward_tier"])
+            "text": reward,
+            "parsed": parse_reward(reward, reward_tier)
         },
         "metadata": {
-            "goalType": card["goal_type"],
-            "rewardTier": card["reward_tier"],
+            "goalType": goal_type,
+            "rewardTier": reward_tier,
             "completionProbability": card.get("completion_prob", 0.5),
-            "stockEV": card.get("stock_ev", 0.0),
+            "stockEV": stock_ev,
             "totalEV": card.get("total_ev", 0.0),
             "score": card.get("score", 0.0)
         }
@@ -971,7 +1037,12 @@ def main():
     goal_cards = create_goal_cards()
 
     # Assign stock changes to goal cards
+    num_goal_cards = len(goal_cards)
     goal_cards = assign_stock_changes(goal_cards, seed=42)
+    if len(goal_cards) < num_goal_cards:
+        print(f"Error: only {len(goal_cards)} of {num_goal_cards} goal cards got a stock change",
+              file=sys.stderr)
+        sys.exit(1)
 
     # Calculate scores and assign rewards to goal cards
     goal_cards = calculate_scores_and_assign_rewards(goal_cards)
@@ -985,57 +1056,52 @@ def main():
     # Format for output
     final_cards = [create_final_card_format(card) for card in all_cards]
 
-    # Output JSON
-    print(json.dumps(final_cards, indent=2))
+    # Output JSON, streamed straight to stdout
+    json.dump(final_cards, sys.stdout, indent=2)
+    sys.stdout.write("\n")
 
     # Print statistics
-    print("\n# Statistics:", file=__import__('sys').stderr)
-    print(f"Total cards: {len(final_cards)}", file=__import__('sys').stderr)
-    print(f"  Goal cards: {len(goal_cards)}", file=__import__('sys').stderr)
-    print(f"  Market manipulation cards: {len(market_cards)}", file=__import__('sys').stderr)
-
-    # Count by reward tier (only for goal cards)
-    tiers = {}
+    err = sys.stderr
+    print("\n# Statistics:", file=err)
+    print(f"Total cards: {len(final_cards)}", file=err)
+    print(f"  Goal cards: {len(goal_cards)}", file=err)
+    print(f"  Market manipulation cards: {len(market_cards)}", file=err)
+
+    # Count by reward tier (only for goal cards) and by goal type in one pass
+    tiers = Counter()
+    goal_types = Counter()
     for card in final_cards:
-        tier = card["metadata"]["rewardTier"]
+        metadata = card["metadata"]
+        tier = metadata["rewardTier"]
         if tier is not None:
-            tiers[tier] = tiers.get(tier, 0) + 1
-    print(f"Reward distribution (goal cards only): {tiers}", file=__import__('sys').stderr)
-
-    # Count by goal type
-    goal_types = {}
-    for card in final_cards:
-        gt = card["metadata"]["goalType"]
-        goal_types[gt] = goal_types.get(gt, 0) + 1
-    print(f"Goal type distribution: {goal_types}", file=__import__('sys').stderr)
+            tiers[tier] += 1
+        goal_types[metadata["goalType"]] += 1
+    print(f"Reward distribution (goal cards only): {dict(tiers)}", file=err)
+    print(f"Goal type distribution: {dict(goal_types)}", file=err)
 
     # Validate and display balance for goal cards
-    net_changes = calculate_net_changes(goal_cards)
-    is_balanced = validate_balance(goal_cards)
-    print(f"\n# Balance Validation (goal cards):", file=__import__('sys').stderr)
-    print(f"Net changes by color: {net_changes}", file=__import__('sys').stderr)
-    print(f"Balanced (all colors net to 0): {is_balanced}", file=__import__('sys').stderr)
+    net_changes, is_balanced, color_freq, is_freq_balanced = summarize_stock_changes(goal_cards)
+    print(f"\n# Balance Validation (goal cards):", file=err)
+    print(f"Net changes by color: {net_changes}", file=err)
+    print(f"Balanced (all colors net to 0): {is_balanced}", file=err)
 
     # Validate balance for market manipulation cards
     # +2/+1 cards: each color gets +2 and +1 = +3
     # -3 cards: each color gets -3
     # Net: +3 - 3 = 0 per color
-    market_net = calculate_net_changes(market_cards)
-    market_balanced = all(v == 0 for v in market_net.values())
-    print(f"\n# Balance Validation (market manipulation cards):", file=__import__('sys').stderr)
-    print(f"Net changes by color: {market_net}", file=__import__('sys').stderr)
-    print(f"Balanced (all colors net to 0): {market_balanced}", file=__import__('sys').stderr)
+    market_net, market_balanced, _, _ = summarize_stock_changes(market_cards)
+    print(f"\n# Balance Validation (market manipulation cards):", file=err)
+    print(f"Net changes by color: {market_net}", file=err)
+    print(f"Balanced (all colors net to 0): {market_balanced}", file=err)
 
     # Display color frequency for goal cards
-    color_freq = calculate_color_frequency(goal_cards)
-    is_freq_balanced = validate_color_frequency_balance(goal_cards)
-    print(f"\n# Color Frequency in Stock Changes (goal cards):", file=__import__('sys').stderr)
+    print(f"\n# Color Frequency in Stock Changes (goal cards):", file=err)
     for color in sorted(COLORS):
-        print(f"{color}: {color_freq.get(color, 0)}", file=__import__('sys').stderr)
+        print(f"{color}: {color_freq.get(color, 0)}", file=err)
     if color_freq:
         freq_range = max(color_freq.values()) - min(color_freq.values())
-        print(f"Range: {freq_range} (target: ≤2)", file=__import__('sys').stderr)
-        print(f"Frequency balanced: {is_freq_balanced}", file=__import__('sys').stderr)
+        print(f"Range: {freq_range} (target: ≤2)", file=err)
+        print(f"Frequency balanced: {is_freq_balanced}", file=err)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,10 @@ Generate an HTML page to visualize goal cards for printing.
 """
 
 import json
+import re
 import sys
+from functools import lru_cache
+from pathlib import Path
 
 HTML_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
@@ -13,27 +16,27 @@ HTML_TEMPLATE = """<!DOCTYPE html>
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Goal Cards</title>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
 
-        body {{
+        body {
             font-family: 'Arial', sans-serif;
             background: #f0f0f0;
             padding: 20px;
-        }}
+        }
 
-        .cards-container {{
+        .cards-container {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(250px, 1fr));
             gap: 40px;
             max-width: 1400px;
             margin: 0 auto;
-        }}
+        }
 
-        .card {{
+        .card {
             background: white;
             border: 2px solid #333;
             border-radius: 8px;
@@ -43,9 +46,9 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             display: flex;
             flex-direction: column;
             justify-content: space-between;
-        }}
+        }
 
-        .stock-change {{
+        .stock-change {
             font-size: 22px;
             font-weight: bold;
             color: #2c3e50;
@@ -53,9 +56,9 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             padding: 20px;
             border-bottom: 1px solid #ddd;
             margin-bottom: 15px;
-        }}
+        }
 
-        .goal {{
+        .goal {
             font-size: 24px;
             color: #34495e;
             text-align: center;
@@ -67,38 +70,38 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             justify-content: center;
             gap: 10px;
             flex-wrap: wrap;
-        }}
+        }
 
-        .card-symbol {{
+        .card-symbol {
             width: 48px;
             height: 66px;
             border-radius: 6px;
             border: 2px solid;
             display: inline-block;
             position: relative;
-        }}
+        }
 
-        .card-symbol.blue {{
+        .card-symbol.blue {
             background-color: #3498db;
             border-color: #2980b9;
-        }}
+        }
 
-        .card-symbol.red {{
+        .card-symbol.red {
             background-color: #e74c3c;
             border-color: #c0392b;
-        }}
+        }
 
-        .card-symbol.yellow {{
+        .card-symbol.yellow {
             background-color: #f1c40f;
             border-color: #f39c12;
-        }}
+        }
 
-        .card-symbol.black {{
+        .card-symbol.black {
             background-color: #2c3e50;
             border-color: #1a252f;
-        }}
+        }
 
-        .reward {{
+        .reward {
             font-size: 18px;
             color: #555;
             background: #f8f9fa;
@@ -107,141 +110,137 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             text-align: center;
             border-top: 1px solid #ddd;
             margin-top: 15px;
-        }}
+        }
 
-        @media print {{
-            @page {{
+        @media print {
+            @page {
                 size: portrait;
                 margin: 0.3in;
-            }}
+            }
 
-            body {{
+            body {
                 background: white;
                 margin: 0;
                 padding: 0;
-            }}
+            }
 
-            .cards-container {{
+            .cards-container {
                 display: grid;
                 grid-template-columns: repeat(3, 1fr);
                 gap: 24px;
                 width: 100%;
                 max-width: none;
-            }}
+            }
 
-            .card {{
+            .card {
                 width: 100%;
                 box-shadow: none;
                 page-break-inside: avoid;
                 padding: 12px;
                 aspect-ratio: 2.2 / 2.85;
-            }}
+            }
 
-            .stock-change {{
+            .stock-change {
                 font-size: 18px;
                 padding: 12px;
                 margin-bottom: 8px;
-            }}
+            }
 
-            .goal {{
+            .goal {
                 font-size: 20px;
                 padding: 8px 0;
-            }}
+            }
 
-            .reward {{
+            .reward {
                 font-size: 14px;
                 padding: 8px;
                 margin-top: 8px;
-            }}
+            }
 
-            .card-symbol {{
+            .card-symbol {
                 width: 38px;
                 height: 52px;
                 -webkit-print-color-adjust: exact;
                 print-color-adjust: exact;
-            }}
+            }
 
-        }}
+        }
 
         /* Color coding for stock colors */
-        .color-blue {{ color: #3498db; font-weight: bold; }}
-        .color-red {{ color: #e74c3c; font-weight: bold; }}
-        .color-yellow {{ color: #f1c40f; font-weight: bold; }}
-        .color-black {{ color: #2c3e50; font-weight: bold; }}
+        .color-blue { color: #3498db; font-weight: bold; }
+        .color-red { color: #e74c3c; font-weight: bold; }
+        .color-yellow { color: #f1c40f; font-weight: bold; }
+        .color-black { color: #2c3e50; font-weight: bold; }
 
         /* Market manipulation cards */
-        .card.market-manipulation {{
+        .card.market-manipulation {
             background: white;
             border-color: #333;
-        }}
+        }
 
-        .card.market-manipulation .stock-change {{
+        .card.market-manipulation .stock-change {
             color: #2c3e50;
             border-bottom-color: #ddd;
-        }}
+        }
 
-        .card.market-manipulation .stock-change.large {{
+        .card.market-manipulation .stock-change.large {
             font-size: 22px;
             padding: 20px;
-        }}
+        }
 
-        .card.market-manipulation .goal.market-label {{
+        .card.market-manipulation .goal.market-label {
             color: #34495e;
             font-size: 16px;
             font-style: italic;
-        }}
+        }
 
-        .card.market-manipulation .reward {{
+        .card.market-manipulation .reward {
             background: #f8f9fa;
             color: #555;
             border-top-color: #ddd;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="cards-container">
-        {cards}
+        $cards
     </div>
 </body>
 </html>
 """
 
-CARD_TEMPLATE = """
-        <div class="card">
-            <div class="stock-change">{stock_change}</div>
-            <div class="goal">{goal}</div>
-            <div class="reward">{reward}</div>
-        </div>
-"""
+# The page only has the one placeholder, so split it there once and
+# concatenate the rendered cards between the two halves
+PAGE_PREFIX, PAGE_SUFFIX = HTML_TEMPLATE.split('$cards')
 
-MARKET_MANIPULATION_CARD_TEMPLATE = """
-        <div class="card market-manipulation">
-            <div class="stock-change large">{stock_change}</div>
-            <div class="goal market-label">Market Manipulation</div>
-            <div class="reward">No goal - play for stock effect only</div>
-        </div>
-"""
+# One "N Color" part of a goal text, e.g. "2 Blue"
+GOAL_PART_RE = re.compile(r'(\d+)\s+(\w+)')
 
 
-def colorize_text(text):
-    """Add color classes to color names in text."""
-    colors = {
-        'Blue': 'blue',
-        'Red': 'red',
-        'Yellow': 'yellow',
-        'Black': 'black'
-    }
+# Colored span for each color name, and a pattern matching any of the names
+COLOR_SPANS = {
+    color_name: f'<span class="color-{color_name.lower()}">{color_name}</span>'
+    for color_name in ('Blue', 'Red', 'Yellow', 'Black')
+}
+COLOR_NAME_RE = re.compile(r'\b(' + '|'.join(COLOR_SPANS) + r')\b')
+
+# Card symbol for each color class used in goals
+CARD_SYMBOLS = {
+    color: f'<div class="card-symbol {color}"></div>'
+    for color in ('blue', 'red', 'yellow', 'black')
+}
 
-    for color_name, color_class in colors.items():
-        text = text.replace(color_name, f'<span class="color-{color_class}">{color_name}</span>')
 
-    return text
+def colorize_text(text):
+    """Add color classes to color names in text."""
+    return COLOR_NAME_RE.sub(lambda match: COLOR_SPANS[match.group(1)], text)
 
 
+# Decks repeat goal texts (e.g. the four one_of_every cards), so each
+# distinct text is only parsed once
+@lru_cache(maxsize=None)
 def goal_to_symbols(goal_text):
     """Convert goal text to visual card symbols."""
-    import re
-
     # Parse the goal text to extract colors and counts
     # Examples: "2 Blue", "2 Blue + 1 Red", "1 Blue + 1 Red + 1 Yellow"
     symbols_html = []
@@ -250,42 +249,53 @@ def goal_to_symbols(goal_text):
     parts = goal_text.split(' + ')
 
     for part in parts:
-        # Extract number and color
-        match = re.match(r'(\d+)\s+(\w+)', part.strip())
-        if match:
-            count = int(match.group(1))
-            color = match.group(2).lower()
+        # Extract number and color; parts are almost always exactly "N Color",
+        # so try a plain split before falling back to the regex. The fast path
+        # only takes parts the regex would read the same way (all digits, then
+        # all letters), so the two can never disagree
+        fields = part.split()
+        if len(fields) == 2 and fields[0].isdecimal() and fields[1].isalpha():
+            count, color = int(fields[0]), fields[1]
+        else:
+            match = GOAL_PART_RE.match(part.strip())
+            if not match:
+                continue
+            count, color = int(match.group(1)), match.group(2)
+        color = color.lower()
 
-            # Add that many card symbols
-            for _ in range(count):
-                symbols_html.append(f'<div class="card-symbol {color}"></div>')
+        # Add that many card symbols
+        symbol = CARD_SYMBOLS.get(color) or f'<div class="card-symbol {color}"></div>'
+        symbols_html.append(symbol * count)
 
     return ''.join(symbols_html)
 
 
-def generate_html(cards_data):
-    """Generate HTML from card data."""
-    cards_html = []
-
-    for card in cards_data:
-        # Check if this is a market manipulation card (no goal)
-        if card.get('goal') is None:
-            card_html = MARKET_MANIPULATION_CARD_TEMPLATE.format(
-                stock_change=colorize_text(card['stockChange']['text'])
-            )
-        else:
-            card_html = CARD_TEMPLATE.format(
-                stock_change=colorize_text(card['stockChange']['text']),
-                goal=goal_to_symbols(card['goal']['text']),
-                reward=card['reward']['text']
-            )
-        cards_html.append(card_html)
+def render_card(card):
+    """Render one card's HTML."""
+    stock_change = colorize_text(card['stockChange']['text'])
 
-    html = HTML_TEMPLATE.format(
-        cards=''.join(cards_html)
-    )
+    # Check if this is a market manipulation card (no goal)
+    if card.get('goal') is None:
+        return f"""
+        <div class="card market-manipulation">
+            <div class="stock-change large">{stock_change}</div>
+            <div class="goal market-label">Market Manipulation</div>
+            <div class="reward">No goal - play for stock effect only</div>
+        </div>
+"""
 
-    return html
+    return f"""
+        <div class="card">
+            <div class="stock-change">{stock_change}</div>
+            <div class="goal">{goal_to_symbols(card['goal']['text'])}</div>
+            <div class="reward">{card['reward']['text']}</div>
+        </div>
+"""
+
+
+def generate_html(cards_data):
+    """Generate HTML from card data."""
+    return PAGE_PREFIX + ''.join(render_card(card) for card in cards_data) + PAGE_SUFFIX
 
 
 def main():
@@ -304,8 +314,7 @@ def main():
 
     # Write to file
     output_file = 'goal_cards.html'
-    with open(output_file, 'w') as f:
-        f.write(html)
+    Path(output_file).write_text(html, encoding='utf-8')
 
     print(f"HTML generated: {output_file}", file=sys.stderr)
     print(f"Total cards: {len(cards_data)}", file=sys.stderr)